@@ -0,0 +1,77 @@
+"""
+Throughput benchmark for the streaming feed validator.
+
+Builds synthetic RSS feeds of increasing size and compares FeedValidator
+with a full feedparser.parse of the same bytes.
+
+    uv run python benchmarks/bench_validate_feed.py --items 2000 --items 20000
+"""
+import os
+import sys
+import time
+import click
+import feedparser
+from email.utils import format_datetime
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+import validate_feed
+
+
+def synthetic_feed(n_items: int) -> bytes:
+    """Build an RSS feed with `n_items` items resembling the generated ones"""
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    parts = [
+        "<?xml version='1.0' encoding='UTF-8'?>\n"
+        '<rss version="2.0"><channel><title>Synthetic</title>'
+        '<link>https://example.com</link><description>Benchmark</description>'
+    ]
+    for i in range(n_items):
+        parts.append(
+            f"<item><title>Item {i}</title>"
+            f"<link>https://example.com/{i}</link>"
+            f"<description>{'Lorem ipsum dolor sit amet. ' * 20}</description>"
+            f"<guid isPermaLink=\"false\">{i}</guid>"
+            f"<category>Mastodon</category>"
+            f"<enclosure url=\"https://example.com/{i}.jpg\" length=\"1234\" type=\"image/*\"/>"
+            f"<pubDate>{format_datetime(start + timedelta(minutes=i))}</pubDate></item>"
+        )
+    parts.append("</channel></rss>")
+    return "".join(parts).encode('utf-8')
+
+
+def best_of(repeat: int, func) -> float:
+    timings = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - t0)
+    return min(timings)
+
+
+@click.command()
+@click.option('--items', '-n', multiple=True, type=int, default=[2000, 20000],
+              help='Number of items in a synthetic feed (repeatable)')
+@click.option('--repeat', '-r', default=3, type=int, help='Repetitions, the best run is reported')
+@click.option('--feedparser/--no-feedparser', 'with_feedparser', default=True,
+              help='Also time feedparser.parse for comparison')
+def main(items, repeat, with_feedparser):
+    """Measure validator throughput on synthetic feeds"""
+    for n_items in items:
+        content = synthetic_feed(n_items)
+        mb = len(content) / 1e6
+        chunks = [content[i:i + validate_feed.CHUNK_SIZE]
+                  for i in range(0, len(content), validate_feed.CHUNK_SIZE)]
+
+        seconds = best_of(repeat, lambda: validate_feed.validate_stream(chunks))
+        print(f"{n_items:>7} items {mb:7.1f} MB  validator   {seconds:8.3f}s "
+              f"{n_items / seconds:>10.0f} items/s {mb / seconds:7.1f} MB/s")
+
+        if with_feedparser:
+            seconds = best_of(repeat, lambda: feedparser.parse(content))
+            print(f"{n_items:>7} items {mb:7.1f} MB  feedparser  {seconds:8.3f}s "
+                  f"{n_items / seconds:>10.0f} items/s {mb / seconds:7.1f} MB/s")
+
+
+if __name__ == '__main__':
+    main()
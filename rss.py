@@ -5,18 +5,29 @@ import logging
 from envyaml import EnvYAML
 import re
 import feedparser
-from datetime import datetime
+from datetime import datetime, timezone
 import dateutil
 from feedgen.feed import FeedGenerator
 import json
 import os
-from typing import Dict, List, Optional, Tuple
+import gzip
+import hashlib
+import heapq
+import calendar
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
 from urllib.parse import urlparse
 from dotenv import load_dotenv
 from html2text import html2text, HTML2Text
 from bs4 import BeautifulSoup
 
 import extract_titles
+import validate_feed
+
+try:
+    import brotli
+except ImportError:  # brotli is optional, only used for the .br variant
+    brotli = None
 
 # Configure logging
 logging.basicConfig(level=logging.ERROR)
@@ -44,6 +55,119 @@ def extract_urls_by_rel(html_string, rel_value="nofollow"):
     return [a['href'] for a in soup.find_all('a', rel=rel_value)]
 
 
+# exit code of `main` when the feed content did not change since the last run
+UNCHANGED_EXIT_CODE = 3
+
+
+def entry_id(entry) -> str:
+    """Return a stable identifier for a feedgen entry (guid, else link)"""
+    if entry.id():
+        return entry.id()
+    links = entry.link() or [{}]
+    return links[0].get('href', '')
+
+
+def _write_compressed(feed_content: bytes, output: str) -> None:
+    """Write the precompressed `.gz` and `.br` variants of a feed"""
+    # mtime=0 keeps the gzip header, and hence the file, byte-stable
+    with open(f"{output}.gz", 'wb') as f:
+        f.write(gzip.compress(feed_content, compresslevel=9, mtime=0))
+    if brotli is not None:
+        with open(f"{output}.br", 'wb') as f:
+            f.write(brotli.compress(feed_content))
+    else:
+        logger.warning("brotli not installed, skipping .br variant")
+        # never leave a stale variant next to the new feed
+        try:
+            os.remove(f"{output}.br")
+        except FileNotFoundError:
+            pass
+
+
+def _published_key(entry) -> tuple:
+    """Sort key for feedparser entries, undated entries sort last"""
+    return tuple(entry.get('published_parsed') or ())
+
+
+class EntryFilter:
+    """
+    Per-source filter for feedparser entries.
+
+    Categories are compiled into sets once, so checking an entry costs one
+    set intersection instead of a scan of the configuration per tag.
+    """
+
+    def __init__(self, exclude_categories: Iterable[str] = (), include_categories: Iterable[str] = (),
+                 max_age_days: Optional[float] = None, now: Optional[float] = None):
+        self.exclude_categories = frozenset(exclude_categories)
+        self.include_categories = frozenset(include_categories)
+        self.min_timestamp = None
+        if max_age_days is not None:
+            self.min_timestamp = (now if now is not None else time.time()) - max_age_days * 86400
+
+    @classmethod
+    def from_config(cls, source: Dict, exclude_categories: Iterable[str] = ()) -> "EntryFilter":
+        """
+        Build the filter of an `rss.urls` item.
+
+        The global `exclude_categories` are combined with the source's own
+        `exclude_categories`; `include_categories` and `max_age_days` are
+        optional per source.
+        """
+        return cls(
+            exclude_categories=list(exclude_categories) + list(source.get('exclude_categories') or []),
+            include_categories=source.get('include_categories') or [],
+            max_age_days=source.get('max_age_days'),
+        )
+
+    def accepts(self, entry) -> bool:
+        terms = {tag.get('term') for tag in entry.get('tags') or ()}
+        if terms & self.exclude_categories:
+            logger.debug(f"Excluded entry with tags {terms}, skipping")
+            return False
+        if self.include_categories and not terms & self.include_categories:
+            return False
+        if self.min_timestamp is not None and entry.get('published_parsed'):
+            if calendar.timegm(entry.published_parsed) < self.min_timestamp:
+                return False
+        return True
+
+
+def select_entries(entries: Iterable, entry_filter: EntryFilter, limit: int, ordered: bool = True) -> List:
+    """
+    Return the newest `limit` entries accepted by `entry_filter`.
+
+    Entries are filtered as they are read, so excluded entries do not use up
+    the budget. If `ordered` is True, the source is trusted to list its
+    entries newest first: reading stops as soon as `limit` entries are
+    accepted, and a newer entry further down is never seen. Only an entry
+    out of order before that point makes the rest of the source be read.
+    With `ordered` False, all entries are read and the newest accepted ones
+    are kept, which is needed for sources not sorted by publication date.
+    """
+    if limit <= 0:
+        return []
+
+    accepted = []
+    in_order = ordered
+    previous = None
+    for entry in entries:
+        key = _published_key(entry)
+        if previous is not None and key > previous:
+            in_order = False
+        previous = key
+
+        if not entry_filter.accepts(entry):
+            continue
+        accepted.append(entry)
+        if in_order and len(accepted) >= limit:
+            return accepted
+
+    if in_order:
+        return accepted
+    return heapq.nlargest(limit, accepted, key=_published_key)
+
+
 def is_iso_format(date_str):
     try:
         dateutil.parser.isoparse(date_str)
@@ -60,6 +184,9 @@ class StarRSSGenerator:
             logger.setLevel(logging.DEBUG)
         self.config = self._load_config(config_file)
         self.feed_item_limit = feed_item_limit
+        # last generated feed and the ids of its items, in feed order
+        self.feed_generator: Optional[FeedGenerator] = None
+        self.item_ids: List[str] = []
         
     def _load_config(self, config_file: str) -> Dict:
         """Load configuration from file"""
@@ -135,25 +262,15 @@ class StarRSSGenerator:
             logger.debug("No Feedbin configuration found, skipping")
             return False
 
+        exclude_categories = self.config['rss'].get('exclude_categories') or []
         for item in self.config["rss"]["urls"]:
             try:
+                entry_filter = EntryFilter.from_config(item, exclude_categories)
+                limit = item.get('limit', self.feed_item_limit)
                 feed = feedparser.parse(item["url"])
-                # Sort entries by published date (newest first)
-                sorted_entries = sorted(
-                    feed.entries,
-                    key=lambda entry: entry.published_parsed if hasattr(entry, "published_parsed") else None,
-                    reverse=True
-                )
-                
-                for entry in sorted_entries[:self.feed_item_limit+1]:
-                    # Skip entries with tags as excluded categories
-                    if 'exclude_categories' in self.config['rss']:
-                        if hasattr(entry, 'tags'):
-                            logger.debug(f"Entry tags: {entry.tags}")
-                            if any(tag.get('term') in self.config['rss']['exclude_categories'] \
-                                   for tag in entry.tags):
-                                logger.debug("Found private entry, skipping")
-                                continue
+
+                ordered = item.get('ordered', True)
+                for entry in select_entries(feed.entries, entry_filter, limit, ordered=ordered):
                     logger.debug("Processing public entry")
                     # now create the entry
                     fe = fg.add_entry()
@@ -263,7 +380,7 @@ class StarRSSGenerator:
         all_items = {item['id']: item for item in mastodon_items}
         sorted_items = sorted(
             all_items.values(),
-            key=lambda x: dateutil.parser.isoparse(self._ensure_iso_datetime(x['created_at'])),
+            key=lambda x: (dateutil.parser.isoparse(self._ensure_iso_datetime(x['created_at'])), x['id']),
             reverse=True
         )                
         for item in sorted_items:
@@ -274,39 +391,133 @@ class StarRSSGenerator:
 
 
 
-        # hack: sort ascending
-        fg._FeedGenerator__feed_entries = sorted(
+        # hack: sort descending, ties are broken by id to keep the output stable
+        entries = sorted(
             fg._FeedGenerator__feed_entries,
-            key=lambda x: x.pubDate(),
+            key=lambda x: (x.pubDate(), entry_id(x)),
             reverse=True
-        )              
-        
-        return fg.rss_str(pretty=True)
+        )
+
+        # the same article may come from several sources (e.g. starred in
+        # Feedbin and bookmarked in linkding), keep only its first entry
+        seen = set()
+        unique_entries = []
+        for entry in entries:
+            key = entry_id(entry)
+            if key in seen:
+                logger.debug(f"Skipping duplicate entry {key}")
+                continue
+            seen.add(key)
+            unique_entries.append(entry)
+        entries = unique_entries
+
+        fg._FeedGenerator__feed_entries = entries
+        self.item_ids = [entry_id(entry) for entry in entries]
+
+        self.feed_generator = fg
+
+        # feedgen defaults lastBuildDate to now, which makes every build
+        # differ; use the newest item instead so it only moves with content
+        return self.render_feed(entries[0].pubDate() if entries else None)
+
+    def render_feed(self, last_build_date: Optional[datetime]) -> bytes:
+        """Serialize the last generated feed, omitting lastBuildDate if None"""
+        assert self.feed_generator is not None, "generate_feed has not been called"
+        if last_build_date is None:
+            self.feed_generator._FeedGenerator__rss_lastBuildDate = None
+        else:
+            self.feed_generator.lastBuildDate(last_build_date)
+        return self.feed_generator.rss_str(pretty=True)
+
+    def publish(self, output: str) -> bool:
+        """
+        Write the last generated feed and its precompressed variants if the
+        content changed.
+
+        A sidecar manifest `<output>.manifest.json` records the SHA-256 of
+        the feed without its lastBuildDate, the lastBuildDate and the item
+        ids. If the stored hash matches, nothing is written; otherwise the
+        feed is written with lastBuildDate set to the current time.
+
+        Args:
+            output (str): Path of the feed file.
+
+        Returns:
+            bool: True if the files were written, False if the feed is unchanged.
+        """
+        digest = hashlib.sha256(self.render_feed(None)).hexdigest()
+        manifest_file = f"{output}.manifest.json"
+
+        if os.path.exists(manifest_file) and os.path.exists(output):
+            try:
+                with open(manifest_file) as f:
+                    previous = json.load(f)
+                if previous.get('sha256') == digest:
+                    logger.info(f"Feed unchanged ({digest}), skipping write")
+                    return False
+            except (OSError, ValueError) as e:
+                logger.warning(f"Ignoring unreadable manifest {manifest_file}: {e}")
+
+        last_build_date = datetime.now(timezone.utc).replace(microsecond=0)
+        feed_content = self.render_feed(last_build_date)
+        with open(output, 'wb') as f:
+            f.write(feed_content)
+        _write_compressed(feed_content, output)
+
+        # write the manifest last, so it never describes a partially written feed
+        with open(manifest_file, 'w') as f:
+            json.dump({
+                'sha256': digest,
+                'last_build_date': last_build_date.isoformat(),
+                'items': self.item_ids,
+            }, f, indent=2)
+            f.write('\n')
+        return True
+
+    def validate(self, feed_content: bytes) -> List[validate_feed.Issue]:
+        """Check the structure of a generated feed without writing it out"""
+        issues = validate_feed.validate_bytes(feed_content)
+        for issue in issues:
+            if issue.severity == 'error':
+                logger.error(str(issue))
+            else:
+                logger.warning(str(issue))
+        return issues
 
 @click.command()
 @click.option('--config', '-c', default='sc_config.yaml', help='Path to configuration file')
 @click.option('--debug/--no-debug', default=False, help='Enable debug output')
-@click.option('--output', '-o', help='Output file (optional, defaults to stdout)')
+@click.option('--output', '-o', help='Output file (optional, defaults to stdout); '
+              f'exits with {UNCHANGED_EXIT_CODE} if its content is unchanged')
 @click.option('--limit', '-l', default=5, help='Number of feed items to include per source', type=int)
 @click.option('--log-level', '-L', 
     type=click.Choice(['DEBUG', 'INFO', 'WARNING', 'ERROR', 'CRITICAL'], case_sensitive=False),
     default='ERROR',
     help='Set logging level')
-def main(config: str, debug: bool, output: Optional[str], limit: int, log_level: str):
+@click.option('--validate/--no-validate', default=False, help='Validate the feed before writing it')
+def main(config: str, debug: bool, output: Optional[str], limit: int, log_level: str, validate: bool):
     """Generate RSS feed from Mastodon favorites and bookmarks"""
     try:
         generator = StarRSSGenerator(config, feed_item_limit=limit, debug=debug, log_level=log_level)
         feed_content = generator.generate_feed()
+
+        if validate:
+            issues = generator.validate(feed_content)
+            if any(issue.severity == 'error' for issue in issues):
+                raise click.ClickException("Generated feed failed validation")
         
         if output:
-            with open(output, 'wb') as f:
-                f.write(feed_content)
+            changed = generator.publish(output)
         else:
             click.echo(feed_content.decode('utf-8'))
+            changed = True
             
     except Exception as e:
         logger.error(f"Error generating feed: {e}")
         raise #        click.ClickException(str(e))
 
+    if not changed:
+        sys.exit(UNCHANGED_EXIT_CODE)
+
 if __name__ == '__main__':
     main()
@@ -1,10 +1,12 @@
 import pytest
-from rss import StarRSSGenerator
+from rss import StarRSSGenerator, EntryFilter, select_entries
 import os
+import gzip
+import json
 import tempfile
 import yaml
 import feedparser
-from datetime import datetime, timezone
+from datetime import datetime, timedelta, timezone
 import xml.etree.ElementTree as ET
 from feedgen.feed import FeedGenerator
 
@@ -238,3 +240,149 @@ def test_iso_datetime_conversion(generator):
     for input_date, expected in test_dates:
         result = generator._ensure_iso_datetime(input_date)
         assert result == expected
+
+def test_generate_feed_is_deterministic(generator, sample_mastodon_status, mocker):
+    """Identical inputs produce byte-identical feeds with a stable item order"""
+    mocker.patch('extract_titles.extract_title', return_value='Test Title')
+    mocker.patch.object(generator, '_fetch_mastodon_data',
+                        return_value=([sample_mastodon_status], None))
+
+    first = generator.generate_feed()
+    second = generator.generate_feed()
+    assert first == second
+
+    feed = feedparser.parse(first)
+    # both entries share a pubDate, the tie is broken by id
+    assert generator.item_ids == ['http://example.com/1', '123456']
+    assert feed.feed.updated == 'Thu, 14 Mar 2024 12:00:00 +0000'
+
+def test_publish_skips_unchanged_content(generator, sample_mastodon_status, mocker, tmp_path):
+    mocker.patch('extract_titles.extract_title', return_value='Test Title')
+    mocker.patch.object(generator, '_fetch_mastodon_data',
+                        return_value=([sample_mastodon_status], None))
+    output = tmp_path / 'stars.rss'
+
+    generator.generate_feed()
+    assert generator.publish(str(output)) is True
+    content = output.read_bytes()
+    assert gzip.decompress((tmp_path / 'stars.rss.gz').read_bytes()) == content
+    manifest = json.loads((tmp_path / 'stars.rss.manifest.json').read_text())
+    assert manifest['items'] == generator.item_ids
+    assert feedparser.parse(content).feed.updated_parsed is not None
+
+    # same content, nothing is rewritten and lastBuildDate is kept
+    mtime = output.stat().st_mtime_ns
+    generator.generate_feed()
+    assert generator.publish(str(output)) is False
+    assert output.stat().st_mtime_ns == mtime
+
+    # an item removed: lastBuildDate is bumped although the newest item is the same
+    mocker.patch.object(generator, '_fetch_rss_feeds', return_value=True)
+    generator.generate_feed()
+    assert generator.publish(str(output)) is True
+    updated = json.loads((tmp_path / 'stars.rss.manifest.json').read_text())
+    assert updated['sha256'] != manifest['sha256']
+    assert updated['items'] == ['123456']
+
+def test_publish_removes_stale_brotli_variant(generator, mocker, tmp_path):
+    mocker.patch.object(generator, '_fetch_mastodon_data', return_value=([], None))
+    mocker.patch('rss.brotli', None)
+    output = tmp_path / 'stars.rss'
+    stale = tmp_path / 'stars.rss.br'
+    stale.write_bytes(b'stale')
+
+    generator.generate_feed()
+    assert generator.publish(str(output)) is True
+    assert not stale.exists()
+
+def test_validate_generated_feed(generator, sample_mastodon_status, mocker):
+    mocker.patch('extract_titles.extract_title', return_value='Test Title')
+    mocker.patch.object(generator, '_fetch_mastodon_data',
+                        return_value=([sample_mastodon_status], None))
+
+    issues = generator.validate(generator.generate_feed())
+    assert not any(issue.severity == 'error' for issue in issues)
+
+def make_entries(tags_per_entry):
+    """Entries newest first, one day apart, with the given category terms"""
+    entries = []
+    for i, terms in enumerate(tags_per_entry):
+        entries.append(feedparser.FeedParserDict(
+            link=f'http://example.com/{i}',
+            published_parsed=(datetime(2024, 3, 30, tzinfo=timezone.utc) - timedelta(days=i)).timetuple(),
+            tags=[feedparser.FeedParserDict(term=term) for term in terms],
+        ))
+    return entries
+
+def test_select_entries_fills_budget_after_exclusions():
+    entries = make_entries([['private']] * 50 + [['public']] * 10)
+    selected = select_entries(entries, EntryFilter(exclude_categories=['private']), 5)
+    assert [e.link for e in selected] == [f'http://example.com/{i}' for i in range(50, 55)]
+
+def test_select_entries_stops_once_budget_is_filled():
+    entries = make_entries([['public']] * 3)
+
+    def stream():
+        yield from entries
+        raise AssertionError("read past the budget")
+
+    assert len(select_entries(stream(), EntryFilter(), 3)) == 3
+
+def test_select_entries_handles_unordered_sources():
+    entries = make_entries([['public']] * 4)
+    entries.reverse()
+    selected = select_entries(entries, EntryFilter(), 2)
+    assert [e.link for e in selected] == ['http://example.com/0', 'http://example.com/1']
+
+def test_select_entries_trusts_order_up_to_the_budget():
+    entries = make_entries([['public']] * 3)
+    entries = [entries[1], entries[2], entries[0]]
+    # the newest entry comes after the budget is filled and is never read
+    selected = select_entries(entries, EntryFilter(), 2)
+    assert [e.link for e in selected] == ['http://example.com/1', 'http://example.com/2']
+
+    selected = select_entries(entries, EntryFilter(), 2, ordered=False)
+    assert [e.link for e in selected] == ['http://example.com/0', 'http://example.com/1']
+
+def test_entry_filter_include_and_max_age():
+    entries = make_entries([['a'], ['b'], ['a', 'b']])
+    only_b = EntryFilter(include_categories=['b'])
+    assert [only_b.accepts(e) for e in entries] == [False, True, True]
+
+    now = datetime(2024, 3, 30, 12, tzinfo=timezone.utc).timestamp()
+    recent = EntryFilter(max_age_days=1, now=now)
+    assert [recent.accepts(e) for e in entries] == [True, False, False]
+
+def test_entry_filter_from_config_merges_exclusions():
+    entry_filter = EntryFilter.from_config(
+        {'url': 'x', 'tag': 'x', 'exclude_categories': ['draft'], 'include_categories': ['public']},
+        ['private'],
+    )
+    assert entry_filter.exclude_categories == {'private', 'draft'}
+    assert entry_filter.include_categories == {'public'}
+
+def test_duplicate_articles_across_sources_pass_validation(sample_mastodon_status, mocker, tmp_path):
+    """The same article in two sources is published once and validates"""
+    config = {
+        'mastodon': {
+            'access_token': 'test_token',
+            'mastodon_instance': 'https://test.social',
+            'mastodon_username': 'test_user',
+            'types': ['favourites']
+        },
+        'rss': {
+            'urls': [
+                {'url': 'tests/test.xml', 'tag': 'feedbin'},
+                {'url': 'tests/test.xml', 'tag': 'linkding'},
+            ],
+            'exclude_categories': ['private']
+        }
+    }
+    config_path = tmp_path / 'config.yaml'
+    config_path.write_text(yaml.dump(config))
+    generator = StarRSSGenerator(str(config_path))
+    mocker.patch.object(generator, '_fetch_mastodon_data', return_value=([], None))
+
+    issues = generator.validate(generator.generate_feed())
+    assert not any(issue.severity == 'error' for issue in issues)
+    assert generator.item_ids == ['http://example.com/3', 'http://example.com/1']
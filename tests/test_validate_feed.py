@@ -0,0 +1,69 @@
+import pytest
+from validate_feed import FeedValidator, validate_bytes, validate_stream
+
+
+def make_feed(items):
+    return (
+        "<?xml version='1.0' encoding='UTF-8'?>\n"
+        '<rss version="2.0"><channel><title>Test</title>'
+        + "".join(items)
+        + "</channel></rss>"
+    ).encode('utf-8')
+
+GOOD_ITEM = (
+    "<item><title>Good</title><link>http://example.com/1</link>"
+    "<guid>http://example.com/1</guid>"
+    "<pubDate>Thu, 14 Mar 2024 12:00:00 +0000</pubDate></item>"
+)
+
+def test_valid_feed():
+    validator = validate_stream([make_feed([GOOD_ITEM])])
+    assert validator.valid
+    assert validator.item_count == 1
+    assert validator.issues == []
+
+def test_item_problems_are_reported_per_item():
+    feed = make_feed([
+        GOOD_ITEM,
+        "<item><title>No guid</title><link>http://example.com/2</link></item>",
+        "<item><guid>abc</guid><pubDate>yesterday</pubDate></item>",
+        GOOD_ITEM,
+        "<item><guid>enc</guid><link>http://example.com/e</link>"
+        '<enclosure url="http://example.com/e.jpg" length="0" type="image/*"/></item>',
+    ])
+    issues = validate_bytes(feed)
+    found = {(issue.item, issue.severity, issue.message.split(' ')[0]) for issue in issues}
+    assert found == {
+        (2, 'warning', 'missing'),
+        (3, 'warning', 'missing'),
+        (3, 'error', 'unparsable'),
+        (4, 'error', 'duplicate'),
+        (5, 'warning', 'zero-length'),
+    }
+
+def test_oversized_item():
+    big = GOOD_ITEM.replace("<title>Good</title>", "<title>" + "x" * 200 + "</title>")
+    issues = validate_bytes(make_feed([big]), max_item_size=100)
+    assert [issue.message.split(' ')[0] for issue in issues] == ['item']
+
+def test_chunked_input_matches_whole_input():
+    feed = make_feed([GOOD_ITEM, "<item><title>No link</title><guid>x</guid></item>"])
+    chunked = validate_stream(feed[i:i + 7] for i in range(0, len(feed), 7))
+    assert chunked.issues == validate_bytes(feed)
+    assert chunked.item_count == 2
+
+@pytest.mark.parametrize("content", [b"", b"<rss><channel><item>", b"<feed></feed>"])
+def test_broken_documents_are_invalid(content):
+    validator = FeedValidator()
+    validator.feed(content)
+    validator.close()
+    assert not validator.valid
+
+def test_parse_error_is_reported_against_the_current_item():
+    feed = make_feed([GOOD_ITEM]).replace(b"</channel>", b"<item><title>x</titl></item></channel>")
+    issues = validate_bytes(feed)
+    assert [(issue.item, issue.message.split(':')[0]) for issue in issues] == [(2, 'XML error')]
+
+def test_parse_error_outside_items_is_reported_against_the_feed():
+    issues = validate_bytes(b"<rss><channel><title>x</titl></channel></rss>")
+    assert [issue.item for issue in issues] == [0]
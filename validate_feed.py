@@ -1,20 +1,176 @@
-import click
-import feedparser
 import sys
+import click
+import xml.etree.ElementTree as ET
+from email.utils import parsedate_to_datetime
+from typing import BinaryIO, Iterable, List, NamedTuple
+
+# items whose text content exceeds this many characters are reported
+DEFAULT_MAX_ITEM_SIZE = 100_000
+
+# size of the chunks handed to the incremental parser when reading a file
+CHUNK_SIZE = 64 * 1024
+
+
+class Issue(NamedTuple):
+    """A problem found in a feed"""
+    severity: str   # 'error' or 'warning'
+    item: int       # 1-based position of the item, 0 for the feed itself
+    item_id: str    # guid or link of the item, empty if unknown
+    message: str
+
+    def __str__(self):
+        where = f"item {self.item}" if self.item else "feed"
+        if self.item_id:
+            where += f" ({self.item_id})"
+        return f"{self.severity}: {where}: {self.message}"
+
+
+class FeedValidator:
+    """
+    Incrementally validate the structure of an RSS 2.0 feed.
+
+    Bytes are passed to `feed` as they arrive and every <item> is checked and
+    discarded as soon as it is complete, so memory use does not grow with the
+    size of the feed. Call `close` to get the list of issues.
+    """
+
+    def __init__(self, max_item_size: int = DEFAULT_MAX_ITEM_SIZE):
+        self.max_item_size = max_item_size
+        self.item_count = 0
+        self.issues: List[Issue] = []
+        self._parser = ET.XMLPullParser(events=('start', 'end'))
+        self._stack: List[ET.Element] = []
+        self._seen_ids = set()
+        self._root_checked = False
+        self._failed = False
+
+    @property
+    def valid(self) -> bool:
+        return not any(issue.severity == 'error' for issue in self.issues)
+
+    def feed(self, data: bytes) -> None:
+        if self._failed:
+            return
+        try:
+            self._parser.feed(data)
+            self._process_events()
+        except ET.ParseError as e:
+            self._parse_error(e)
+
+    def close(self) -> List[Issue]:
+        if not self._failed:
+            try:
+                self._parser.close()
+                self._process_events()
+            except ET.ParseError as e:
+                self._parse_error(e)
+        if not self._root_checked and not self._failed:
+            self._add('error', 0, '', "document is empty")
+        return self.issues
+
+    def _add(self, severity: str, item: int, item_id: str, message: str) -> None:
+        self.issues.append(Issue(severity, item, item_id, message))
+
+    def _parse_error(self, error: ET.ParseError) -> None:
+        self._failed = True
+        # the error belongs to the item being parsed, if any, else to the feed
+        in_item = any(elem.tag == 'item' for elem in self._stack)
+        self._add('error', self.item_count + 1 if in_item else 0, '', f"XML error: {error}")
+
+    def _process_events(self) -> None:
+        for event, elem in self._parser.read_events():
+            if event == 'start':
+                if not self._root_checked:
+                    self._root_checked = True
+                    if elem.tag != 'rss':
+                        self._add('error', 0, '', f"root element is <{elem.tag}>, expected <rss>")
+                self._stack.append(elem)
+                continue
+
+            self._stack.pop()
+            if elem.tag == 'item':
+                self.item_count += 1
+                self._check_item(elem)
+                # drop the finished item, it is always the last child of its parent
+                parent = self._stack[-1] if self._stack else None
+                if parent is not None and len(parent) and parent[-1] is elem:
+                    del parent[-1]
+
+    def _check_item(self, item: ET.Element) -> None:
+        position = self.item_count
+        guid = (item.findtext('guid') or '').strip()
+        link = (item.findtext('link') or '').strip()
+        item_id = guid or link
+
+        if not guid:
+            self._add('warning', position, item_id, "missing guid")
+        if not link:
+            self._add('warning', position, item_id, "missing link")
+
+        if item_id:
+            if item_id in self._seen_ids:
+                self._add('error', position, item_id, "duplicate id")
+            self._seen_ids.add(item_id)
+
+        pub_date = item.findtext('pubDate')
+        if pub_date is not None:
+            try:
+                parsedate_to_datetime(pub_date.strip())
+            except (TypeError, ValueError):
+                self._add('error', position, item_id, f"unparsable pubDate {pub_date!r}")
+
+        for enclosure in item.iter('enclosure'):
+            if enclosure.get('length', '0').strip() in ('', '0'):
+                self._add('warning', position, item_id,
+                          f"zero-length enclosure {enclosure.get('url', '')}")
+
+        size = sum(len(e.text or '') + len(e.tail or '') for e in item.iter())
+        if size > self.max_item_size:
+            self._add('warning', position, item_id,
+                      f"item size {size} exceeds {self.max_item_size} characters")
+
+
+def validate_bytes(content: bytes, max_item_size: int = DEFAULT_MAX_ITEM_SIZE) -> List[Issue]:
+    """Validate an in-memory feed and return the issues found"""
+    validator = FeedValidator(max_item_size=max_item_size)
+    validator.feed(content)
+    return validator.close()
+
+
+def validate_stream(chunks: Iterable[bytes], max_item_size: int = DEFAULT_MAX_ITEM_SIZE) -> FeedValidator:
+    """Validate a feed given as an iterable of byte chunks"""
+    validator = FeedValidator(max_item_size=max_item_size)
+    for chunk in chunks:
+        validator.feed(chunk)
+    validator.close()
+    return validator
+
+
+def _read_chunks(stream: BinaryIO) -> Iterable[bytes]:
+    while True:
+        chunk = stream.read(CHUNK_SIZE)
+        if not chunk:
+            break
+        yield chunk
 
 
 @click.command()
-@click.argument('feedfile', type=click.File('r'), default='-')
-def main(feedfile):
+@click.argument('feedfile', type=click.File('rb'), default='-')
+@click.option('--max-item-size', default=DEFAULT_MAX_ITEM_SIZE, type=int,
+              help='Report items with more text than this many characters')
+def main(feedfile, max_item_size):
     """Validate RSS feed from file or stdin. Use - for stdin."""
-    
-    content = feedfile.read()
-    feed = feedparser.parse(content)
-    
-    if feed.bozo:
-        print("Invalid RSS feed")
+
+    validator = validate_stream(_read_chunks(feedfile), max_item_size=max_item_size)
+
+    for issue in validator.issues:
+        click.echo(str(issue), err=True)
+
+    if validator.valid:
+        print(f"Valid RSS feed ({validator.item_count} items)")
     else:
-        print("Valid RSS feed")
+        print("Invalid RSS feed")
+        sys.exit(1)
 
 if __name__ == '__main__':
     main()